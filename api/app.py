@@ -1,16 +1,17 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, status
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import json
 import time
 from datetime import datetime
 
-# Import your RAG components
-from langchain_community.vectorstores import Chroma
+from api.pagination import encode_cursor, start_index, to_ndjson, NDJSON_MEDIA_TYPE
+
+# Import your RAG components (Chroma + embeddings are imported in init_rag)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 
 app = FastAPI(
     title="RAG Scraper API",
@@ -18,13 +19,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# ✅ CORS middleware
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# ✅ CORS middleware (browsers only see the paging cursor header if it is exposed)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -94,26 +98,49 @@ class DocumentResponse(BaseModel):
 
 class SearchRequest(BaseModel):
     query: str
-    limit: Optional[int] = 5
+    limit: int = Field(5, ge=1, le=1000)
+    cursor: Optional[str] = None
+    stream: bool = False
+
+STREAM_BATCH = 500  # rows per chunk when streaming NDJSON
 
 # ✅ Initialize RAG components
-print("Initializing RAG system...")
+# Built on startup rather than at import, so the helpers below can be reused
+# with other datasets / chunking (see bench/eval_retrieval.py).
+DATASET_PATH = "new_qa_dataset.json"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-with open("new_qa_dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+documents = []
+vectorstore = None
 
-documents = [f"Q: {p['question']}\nA: {p['answer']}" for item in data for p in item["qa_pairs"]]
+def load_documents(path: str = DATASET_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [f"Q: {p['question']}\nA: {p['answer']}" for item in data for p in item["qa_pairs"]]
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-chunks = splitter.split_text("\n\n".join(documents))
+def split_documents(documents, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text("\n\n".join(documents))
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-vectorstore = Chroma.from_texts(chunks, embeddings)
-print("RAG system initialized successfully!")
+@app.on_event("startup")
+def init_rag():
+    global documents, vectorstore
+    from langchain_community.vectorstores import Chroma
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    print("Initializing RAG system...")
+    documents = load_documents()
+    chunks = split_documents(documents)
+
+    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    vectorstore = Chroma.from_texts(chunks, embeddings)
+    print("RAG system initialized successfully!")
 
 # ✅ RAG function (your existing logic)
-def smart_retrieval_answer(question: str, k: int = 3):
-    relevant_docs = vectorstore.similarity_search(question, k=k)
+def smart_retrieval_answer(question: str, k: int = 3, store=None):
+    store = vectorstore if store is None else store
+    relevant_docs = store.similarity_search(question, k=k)
     if not relevant_docs:
         return "No relevant information found.", []
     answers = []
@@ -125,6 +152,22 @@ def smart_retrieval_answer(question: str, k: int = 3):
         return answers[0], relevant_docs
     return relevant_docs[0].page_content[:200], relevant_docs
 
+# ✅ Paging helpers: document ids are positions in `documents`, so the
+# cursor is simply the last id a client has seen.
+def stream_documents(ids):
+    buf = []
+    for i in ids:
+        buf.append(to_ndjson({"id": i, "content": documents[i], "source": "scraped_qa_dataset"}))
+        if len(buf) >= STREAM_BATCH:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+def matching_ids(query: str, start: int):
+    needle = query.lower()
+    return (i for i in range(start, len(documents)) if needle in documents[i].lower())
+
 # ✅ API Endpoints (meeting all requirements)
 
 @app.get("/", response_model=dict)
@@ -143,17 +186,31 @@ async def health_check():
 
 @app.get("/raw-data", response_model=List[DocumentResponse])
 async def get_raw_data(
-    limit: int = 10,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(10, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     api_key: str = Depends(get_api_key)
 ):
-    """✅ Fetching raw scraped data - REQUIRED"""
+    """✅ Fetching raw scraped data - REQUIRED
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the
+    next page; `stream=true` returns everything after it as NDJSON.
+    """
     rate_limit(api_key)
-    
-    end_index = min(offset + limit, len(documents))
+
+    start = start_index(range(len(documents)), cursor) if cursor else offset
+    if stream:
+        return StreamingResponse(
+            stream_documents(range(start, len(documents))),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    end_index = min(start + limit, len(documents))
     response_docs = []
     
-    for i, doc in enumerate(documents[offset:end_index], start=offset):
+    for i, doc in enumerate(documents[start:end_index], start=start):
         response_docs.append(
             DocumentResponse(
                 id=i,
@@ -161,6 +218,9 @@ async def get_raw_data(
                 source="scraped_qa_dataset"
             )
         )
+
+    if end_index < len(documents):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(end_index - 1)
     
     return response_docs
 
@@ -197,23 +257,33 @@ async def query_rag(
 @app.post("/search", response_model=List[DocumentResponse])
 async def search_documents(
     request: SearchRequest,
+    response: Response,
     api_key: str = Depends(get_api_key)
 ):
     """✅ Searching indexed data - REQUIRED"""
     rate_limit(api_key)
+
+    start = start_index(range(len(documents)), request.cursor)
+    if request.stream:
+        return StreamingResponse(
+            stream_documents(matching_ids(request.query, start)),
+            media_type=NDJSON_MEDIA_TYPE
+        )
     
     matching_docs = []
-    for i, doc in enumerate(documents):
-        if request.query.lower() in doc.lower():
-            matching_docs.append(
-                DocumentResponse(
-                    id=i,
-                    content=doc,
-                    source="scraped_qa_dataset"
-                )
-            )
+    for i in matching_ids(request.query, start):
         if len(matching_docs) >= request.limit:
             break
+        matching_docs.append(
+            DocumentResponse(
+                id=i,
+                content=documents[i],
+                source="scraped_qa_dataset"
+            )
+        )
+
+    if matching_docs and len(matching_docs) == request.limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(matching_docs[-1].id)
     
     return matching_docs
 
@@ -1,14 +1,21 @@
 # api.py / main.py
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, status
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
-import time
+from itertools import islice
+import os, time
 from datetime import datetime
 
-# ✅ Import RAG engine (already loads DB + embeddings)
-from rag.rag_engine import smart_retrieval, qa_dict, vectorstore
+# ✅ Import RAG engine (cheap; DB + embeddings load in the background on startup)
+from rag import rag_engine
+from rag.rag_engine import smart_retrieval
+from rag import profiler
+from rag.metrics import REQUEST_SECONDS, render as render_metrics
+from rag.sharding import shard_health
+from api.pagination import encode_cursor, start_index, to_ndjson, NDJSON_MEDIA_TYPE
 
 # ---------------------- FastAPI Setup ----------------------
 app = FastAPI(
@@ -25,11 +32,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"   # per-request latency histogram
+
+class RequestMetrics:
+    """
+    Plain ASGI middleware timing each request until its response headers
+    go out. Unlike @app.middleware("http") it doesn't wrap the response in
+    a second streaming layer, so the per-request cost is a timer and one
+    histogram observe (bench/run.py reports it, metrics on vs off).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+
+        async def send_and_observe(message):
+            if message["type"] == "http.response.start":
+                # label by route template (/raw-data), not raw path, to keep cardinality fixed
+                route = scope.get("route")
+                REQUEST_SECONDS.labels(
+                    scope["method"], getattr(route, "path", "unmatched"), message["status"]
+                ).observe(time.perf_counter() - t0)
+            await send(message)
+
+        await self.app(scope, receive, send_and_observe)
+
+app.add_middleware(RequestMetrics)
+
 # ---------------------- API Key Auth ----------------------
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
 VALID_API_KEYS = {"student-key-123": "Roukaya", "teacher-key-456": "Instructor"}
 
+RATE_LIMIT_PER_HOUR = int(os.getenv("RATE_LIMIT_PER_HOUR", "50"))
+
 request_counts = {}
 
 def get_api_key(api_key: str = Depends(api_key_header)) -> str:
@@ -37,7 +76,7 @@ def get_api_key(api_key: str = Depends(api_key_header)) -> str:
         return api_key
     raise HTTPException(status_code=401, detail="Invalid API Key")
 
-def rate_limit(api_key: str, limit: int = 50, window: int = 3600):
+def rate_limit(api_key: str, limit: int = RATE_LIMIT_PER_HOUR, window: int = 3600):
     now = time.time()
     key = f"{api_key}_{int(now // window)}"
     request_counts[key] = request_counts.get(key, 0) + 1
@@ -47,11 +86,89 @@ def rate_limit(api_key: str, limit: int = 50, window: int = 3600):
 # ---------------------- Models ----------------------
 class QueryRequest(BaseModel):
     question: str
-    top_k: Optional[int] = 5
+    top_k: int = Field(5, ge=1, le=100)
 
 class SearchRequest(BaseModel):
     query: str
-    limit: Optional[int] = 5
+    limit: int = Field(5, ge=1, le=1000)
+    cursor: Optional[str] = None
+    stream: bool = False
+
+STREAM_BATCH = 500  # rows per chunk when streaming NDJSON
+
+# ---------------------- Readiness ----------------------
+# The engine loads on a background thread (see startup below). Until it is
+# done these return 503 + Retry-After, which nginx treats as "try the next
+# replica", so a restarting instance never answers with a half-built index.
+def require_corpus():
+    if not rag_engine.status["corpus_ready"]:
+        raise HTTPException(status_code=503, detail="Corpus is still loading", headers={"Retry-After": "5"})
+
+def require_index():
+    if not rag_engine.status["ready"]:
+        raise HTTPException(status_code=503, detail="Vector index is still loading", headers={"Retry-After": "5"})
+
+def readiness():
+    s = rag_engine.status
+    state = {
+        "ready": s["ready"],
+        "phase": s["phase"],
+        "progress": round(s["progress"], 3),
+        "loaded_pairs": s["loaded_pairs"],
+        "index_version": s["index_version"],
+        "phase_seconds": dict(s["phase_seconds"]),   # copy: the loader thread adds keys
+        "error": s["error"],
+        "attempts": s["attempts"],
+        "retry_in": s["retry_in"],
+    }
+    if rag_engine.is_coordinator:
+        # vectors live on the shards: ready only while at least one can answer
+        shards = shard_health()
+        state["shards_ready"] = sum(shards.values())
+        state["shards_total"] = len(shards)
+        state["ready"] = s["ready"] and state["shards_ready"] > 0
+    return state
+
+# ---------------------- Corpus iteration ----------------------
+# Everything walks qa_order (sorted by global_part) so pages and exports
+# see the same stable order and can resume from any row's cursor. Each
+# request takes one snapshot so a reload mid-stream can't mix corpora.
+def corpus():
+    return rag_engine.qa_dict, rag_engine.qa_order, rag_engine.qa_order_keys
+
+def iter_rows(snapshot, start: int):
+    qa, order, _ = snapshot
+    for i in range(start, len(order)):
+        q = order[i]
+        yield i, q, qa[q]
+
+def iter_matches(snapshot, query: str, start: int):
+    needle = query.lower()
+    for i, q, (a, m) in iter_rows(snapshot, start):
+        if needle in q or needle in a.lower():
+            yield i, q, (a, m)
+
+def stream_ndjson(snapshot, rows):
+    keys = snapshot[2]
+    buf = []
+    for i, q, (a, m) in rows:
+        buf.append(to_ndjson({
+            "question": q,
+            "answer": a,
+            "meta": m,
+            "cursor": encode_cursor(keys[i]),
+        }))
+        if len(buf) >= STREAM_BATCH:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+# ---------------------- Startup ----------------------
+@app.on_event("startup")
+def warm_up():
+    rag_engine.start_background_load()
 
 
 # ---------------------- Routes ----------------------
@@ -62,16 +179,55 @@ def home():
 @app.get("/health")
 def health():
     return {
-        "status": "ok",
-        "loaded_pairs": len(qa_dict),
-        "vector_store_ready": True,
+        "status": "failed" if rag_engine.status["phase"] == "failed" else "ok",
+        **readiness(),
+        "vector_store_ready": rag_engine.status["ready"],
         "time": datetime.utcnow()
     }
-@app.post("/query")
+
+@app.get("/health/live")
+def health_live(response: Response):
+    """Liveness: 200 while the process is up and loading (or retrying); 503 once load gave up and it is exiting."""
+    if rag_engine.status["gave_up"]:
+        response.status_code = 503
+        return {"status": "failed", "error": rag_engine.status["error"], "time": datetime.utcnow()}
+    return {"status": "alive", "time": datetime.utcnow()}
+
+@app.get("/health/ready")
+def health_ready(response: Response):
+    """Readiness: 200 once queries can be answered, 503 while loading."""
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def debug_profile(
+    seconds: float = Query(10, gt=0, le=profiler.MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    api_key: str = Depends(get_api_key)
+):
+    """Sample all threads for `seconds`; returns folded stacks for flamegraph.pl / speedscope."""
+    if not profiler.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set PROFILER_ENABLED=1)")
+    try:
+        return profiler.folded(profiler.sample(seconds, interval_ms / 1000))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/query", dependencies=[Depends(require_index)])
 def query(data: QueryRequest, api_key: str = Depends(get_api_key)):
     rate_limit(api_key)
 
-    results = smart_retrieval(data.question, data.top_k)
+    shards = {}
+    results = smart_retrieval(data.question, data.top_k, shards)
+    if shards and not shards["responded"]:
+        raise HTTPException(status_code=503, detail="No index shard responded", headers={"Retry-After": "5"})
 
     formatted = [
         {
@@ -84,28 +240,55 @@ def query(data: QueryRequest, api_key: str = Depends(get_api_key)):
         for r in results
     ]
 
-    return {
+    response = {
         "query": data.question,
         "results": formatted,
         "count": len(results),
         "timestamp": datetime.utcnow()
     }
+    if shards:
+        # a partial merge means some shards' best matches may be missing
+        response["shards"] = {**shards, "partial": shards["responded"] < shards["total"]}
+    return response
 
 
-@app.post("/search")
+@app.post("/search", dependencies=[Depends(require_corpus)])
 def search(data: SearchRequest, api_key: str = Depends(get_api_key)):
     rate_limit(api_key)
 
-    matches = [
-        q for q, (a, m) in qa_dict.items()
-        if data.query.lower() in q.lower() or data.query.lower() in a.lower()
-    ][:data.limit]
+    snapshot = corpus()
+    _, _, keys = snapshot
+    start = start_index(keys, data.cursor)
+    if data.stream:
+        return StreamingResponse(
+            stream_ndjson(snapshot, iter_matches(snapshot, data.query, start)),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    page = list(islice(iter_matches(snapshot, data.query, start), data.limit))
+    matches = [q for _, q, _ in page]
+    next_cursor = None
+    if page and len(page) == data.limit:
+        next_cursor = encode_cursor(keys[page[-1][0]])
 
-    return {"query": data.query, "results": matches}
+    return {"query": data.query, "results": matches, "next_cursor": next_cursor}
 
-@app.get("/raw-data")
-def raw(limit: int = 5, api_key: str = Depends(get_api_key)):
+@app.get("/raw-data", dependencies=[Depends(require_corpus)])
+def raw(
+    limit: int = Query(5, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    api_key: str = Depends(get_api_key)
+):
     rate_limit(api_key)
 
-    data = list(qa_dict.items())[:limit]
-    return {"count": len(data), "data": data}
+    snapshot = corpus()
+    qa, order, keys = snapshot
+    start = start_index(keys, cursor)
+    if stream:
+        return StreamingResponse(stream_ndjson(snapshot, iter_rows(snapshot, start)), media_type=NDJSON_MEDIA_TYPE)
+
+    end = min(start + limit, len(order))
+    data = [(q, qa[q]) for q in order[start:end]]
+    next_cursor = encode_cursor(keys[end - 1]) if end < len(order) else None
+    return {"count": len(data), "data": data, "next_cursor": next_cursor}
@@ -0,0 +1,42 @@
+# pagination.py
+import base64, json
+from bisect import bisect_right
+from fastapi import HTTPException
+
+# ----------------------------
+# Opaque cursors
+# ----------------------------
+# A cursor is the sort key of the last item a client has seen, JSON-encoded
+# and base64'd so clients treat it as an opaque token. Resuming is a bisect
+# into the sorted key list, so a page costs O(log n + limit) however deep
+# the cursor points.
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_cursor(key) -> str:
+    raw = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key) if isinstance(key, list) else key
+
+
+def start_index(sorted_keys: list, cursor: str = None) -> int:
+    """Position of the first item strictly after the cursor."""
+    if not cursor:
+        return 0
+    try:
+        return bisect_right(sorted_keys, decode_cursor(cursor))
+    except TypeError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def to_ndjson(row) -> str:
+    return json.dumps(row, ensure_ascii=False, default=str) + "\n"
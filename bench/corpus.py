@@ -0,0 +1,76 @@
+# corpus.py
+# Synthetic HTML pages served from a local HTTP server, so the scrape path
+# can be benchmarked without touching live sites.
+import random, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "openai model training data compute company board foundation research "
+    "policy safety market investors product release agent search index "
+    "vector embedding latency throughput cluster replica shard query page "
+    "article report analysis growth revenue partnership governance"
+).split()
+
+
+def make_sentence(rng: random.Random, n_words: int = 18) -> str:
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    words[0] = words[0].capitalize()
+    return " ".join(words)
+
+
+def make_page(n: int, paragraphs: int = 12, sentences: int = 6) -> str:
+    """Deterministic page `n`, with the boilerplate clean_and_make_qa strips."""
+    rng = random.Random(n)
+    body = "\n".join(
+        "<p>" + ". ".join(make_sentence(rng) for _ in range(sentences)) + ".</p>"
+        for _ in range(paragraphs)
+    )
+    return (
+        "<html><head><title>Synthetic page {n}</title>"
+        "<style>p {{ margin: 0 }}</style><script>var x = {n};</script></head>"
+        "<body><header>Site header</header><nav><a href='/'>home</a></nav>"
+        "<article><h1>Synthetic page {n}</h1>{body}</article>"
+        "<aside>related links</aside><form><input name='q'></form>"
+        "<footer>footer text</footer></body></html>"
+    ).format(n=n, body=body)
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    pages = {}
+
+    def do_GET(self):
+        html = self.pages.get(self.path)
+        if html is None:
+            self.send_error(404)
+            return
+        data = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class PageServer:
+    """Serve `n_pages` synthetic pages at /page/<i> on a free local port."""
+
+    def __init__(self, n_pages: int, **page_kwargs):
+        handler = type("PageHandler", (_PageHandler,), {
+            "pages": {f"/page/{i}": make_page(i, **page_kwargs) for i in range(n_pages)}
+        })
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.urls = [f"{self.base_url}{path}" for path in handler.pages]
+        self.pages = handler.pages
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,300 @@
+# eval_retrieval.py
+# Retrieval quality vs latency sweep over the bundled QA datasets.
+#
+#   python -m bench.eval_retrieval
+#   python -m bench.eval_retrieval --k 1,3,5 --chunks 1000:200,500:50 \
+#       --backends chroma,numpy --quantization none,float16,int8 --floor 0.9 --repeat 20
+#
+# Every distinct question from the datasets is replayed, the gold answers
+# being the ones it was written for, through three pipelines:
+#   engine  - rag_engine.smart_retrieval (answers embedded, exact lookup first)
+#   vector  - rag_engine.vector_search on the same index, skipping the lookup
+#   chunked - api/app.py smart_retrieval_answer over "Q: .. A: .." chunks
+# Each (pipeline, backend, quantization, chunking, k) row reports recall@k,
+# MRR, exact-match rate, p50/p95/p99 latency (over --repeat replays of the
+# question set, which alone is too small for tail percentiles) and index memory (vector bytes,
+# n * dim * bytes per value, plus the RSS growth of the build, measured the
+# same way for every backend).
+import argparse, contextlib, io, json, os, time
+from datetime import datetime
+from urllib.parse import urlparse
+
+for var in ("RAG_SHARD_URLS", "RAG_SHARD_COUNT", "RAG_INDEX_DIR"):
+    os.environ.pop(var, None)
+
+from bench.measure import percentiles, rss_mb
+
+DATASETS = ("qa_dataset.json", "new_qa_dataset.json")
+GOLD_PREFIX = 120   # chars of the gold answer a retrieved chunk must contain
+BYTES_PER_VALUE = {"none": 4, "float16": 2, "int8": 1}   # chroma stores float32
+
+
+# ----------------------------
+# Data
+# ----------------------------
+
+def load_datasets(paths):
+    """Dataset files -> `clean_pages`-shaped docs, numbered like the worker does."""
+    docs, global_part = [], 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                pairs = []
+                for local_part, p in enumerate(item["qa_pairs"], 1):
+                    global_part += 1
+                    pairs.append({
+                        "question": p["question"],
+                        "answer": p["answer"],
+                        "meta": {
+                            "url": item["url"],
+                            "domain": urlparse(item["url"]).netloc,
+                            "local_part": local_part,
+                            "global_part": global_part,
+                        },
+                    })
+                docs.append({"url": item["url"], "qa_pairs": pairs})
+    return docs
+
+
+def gold_questions(docs):
+    """
+    (question, gold answers) per distinct question. The datasets repeat some
+    questions ("What does the page say in part N?") with different answers;
+    those are asked once and any of their answers counts as relevant.
+    Returns (questions, {question: times it appears}) for the duplicates.
+    """
+    golds, counts = {}, {}
+    for d in docs:
+        for p in d["qa_pairs"]:
+            key = p["question"].strip().lower()
+            golds.setdefault(key, (p["question"], []))[1].append(p["answer"].strip())
+            counts[key] = counts.get(key, 0) + 1
+    questions = [(q, tuple(answers)) for q, answers in golds.values()]
+    duplicates = {golds[key][0]: n for key, n in counts.items() if n > 1}
+    return questions, duplicates
+
+
+# ----------------------------
+# Scoring
+# ----------------------------
+
+def score(retrieve, questions, k, relevant, repeat=1):
+    """
+    retrieve(question) -> (candidates, top_answer, exact_lookup)
+    relevant(candidate, golds) -> bool
+    Quality comes from the first pass; latency from all `repeat` passes.
+    """
+    latencies, hits, reciprocal, exact, lookups = [], 0, 0.0, 0, 0
+    for _ in range(repeat - 1):
+        for question, _golds in questions:
+            t0 = time.perf_counter()
+            retrieve(question)
+            latencies.append(time.perf_counter() - t0)
+
+    for question, golds in questions:
+        t0 = time.perf_counter()
+        candidates, top_answer, exact_lookup = retrieve(question)
+        latencies.append(time.perf_counter() - t0)
+
+        rank = next((i for i, c in enumerate(candidates[:k], 1) if relevant(c, golds)), None)
+        if rank:
+            hits += 1
+            reciprocal += 1 / rank
+        exact += int((top_answer or "").strip() in golds)
+        lookups += int(bool(exact_lookup))
+
+    n = len(questions)
+    lat = percentiles(latencies)
+    return {
+        "recall@k": round(hits / n, 4),
+        "mrr": round(reciprocal / n, 4),
+        "exact_match": round(exact / n, 4),
+        "lookup_hit_rate": round(lookups / n, 4),
+        "p50_ms": lat["p50_ms"],
+        "p95_ms": lat["p95_ms"],
+        "p99_ms": lat["p99_ms"],
+        "samples": lat["n"],
+    }
+
+
+def index_size(n, dim, quantization, rss_before):
+    """(vector MB as n * dim * bytes per value, RSS growth MB), alike for every backend."""
+    return round(n * dim * BYTES_PER_VALUE[quantization] / 2**20, 3), round(rss_mb() - rss_before, 1)
+
+
+def drop(store):
+    # in-memory Chroma collections outlive the wrapper; free them between configs
+    if hasattr(store, "delete_collection"):
+        store.delete_collection()
+
+
+# ----------------------------
+# Pipelines
+# ----------------------------
+
+def eval_engine(docs, questions, dim, backend, quantization, ks, modes, repeat):
+    """The rag_engine index, queried through smart_retrieval and/or vector_search."""
+    from rag import rag_engine
+
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag_engine.load(docs, backend=backend, quantization=quantization)
+    build_s = time.perf_counter() - t0
+    vectors_mb, rss_delta_mb = index_size(len(rag_engine.texts), dim, quantization, rss0)
+
+    search = {"engine": rag_engine.smart_retrieval, "vector": rag_engine.vector_search}
+    rows = []
+    for mode in modes:
+        for k in ks:
+            def retrieve(question):
+                results = search[mode](question, k)
+                answers = [r["answer"] for r in results]
+                return answers, answers[0] if answers else None, results and results[0]["exact_match"]
+
+            row = {"pipeline": mode, "backend": backend, "quantization": quantization, "chunks": "-", "k": k}
+            row.update(score(retrieve, questions, k, lambda a, golds: a.strip() in golds, repeat))
+            row.update(vectors_mb=vectors_mb, rss_mb=rss_delta_mb, build_s=round(build_s, 3))
+            rows.append(row)
+
+    drop(rag_engine.vectorstore)
+    return rows
+
+
+def eval_chunked(dataset_paths, questions, dim, backend, quantization, chunk_size, chunk_overlap, ks, repeat):
+    from rag import rag_engine
+    from api import app as legacy_app
+
+    documents = [doc for path in dataset_paths for doc in legacy_app.load_documents(path)]
+    chunks = legacy_app.split_documents(documents, chunk_size, chunk_overlap)
+
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        store = rag_engine.build_index(chunks, [{} for _ in chunks], backend=backend, quantization=quantization)
+    build_s = time.perf_counter() - t0
+    vectors_mb, rss_delta_mb = index_size(len(chunks), dim, quantization, rss0)
+
+    rows = []
+    for k in ks:
+        def retrieve(question):
+            answer, docs = legacy_app.smart_retrieval_answer(question, k, store=store)
+            return [d.page_content for d in docs], answer, False
+
+        row = {"pipeline": "chunked", "backend": backend, "quantization": quantization,
+               "chunks": f"{chunk_size}:{chunk_overlap}", "k": k}
+        row.update(score(retrieve, questions, k,
+                         lambda chunk, golds: any(g[:GOLD_PREFIX] in chunk for g in golds), repeat))
+        row.update(vectors_mb=vectors_mb, rss_mb=rss_delta_mb, build_s=round(build_s, 3), n_chunks=len(chunks))
+        rows.append(row)
+
+    drop(store)
+    return rows
+
+
+# ----------------------------
+# Report
+# ----------------------------
+
+COLUMNS = ("pipeline", "backend", "quantization", "chunks", "k", "recall@k", "mrr", "exact_match",
+           "lookup_hit_rate", "p50_ms", "p95_ms", "p99_ms", "vectors_mb", "rss_mb", "build_s")
+
+
+def print_table(rows):
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in COLUMNS}
+    print(" | ".join(c.ljust(widths[c]) for c in COLUMNS))
+    print("-|-".join("-" * widths[c] for c in COLUMNS))
+    for r in rows:
+        print(" | ".join(str(r.get(c, "")).ljust(widths[c]) for c in COLUMNS))
+
+
+def fastest_meeting(rows, floor, metric):
+    # rows answered from the qa_dict lookup measure a dict hit, not retrieval
+    ok = [r for r in rows if r[metric] >= floor and not r["lookup_hit_rate"]]
+    return min(ok, key=lambda r: (r["p95_ms"], r["p50_ms"])) if ok else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality vs latency sweep")
+    parser.add_argument("--datasets", default=",".join(DATASETS))
+    parser.add_argument("--pipelines", default="engine,vector,chunked")
+    parser.add_argument("--k", default="1,3,5,8")
+    parser.add_argument("--chunks", default="1000:200,500:100,250:50", help="size:overlap list (chunked pipeline)")
+    parser.add_argument("--backends", default="chroma,numpy")
+    parser.add_argument("--quantization", default="none,float16,int8", help="numpy backend only")
+    parser.add_argument("--model", help="embedding model (default RAG_EMBED_MODEL)")
+    parser.add_argument("--floor", type=float, default=0.9, help="quality floor for the recommendation")
+    parser.add_argument("--floor-metric", default="recall@k", choices=["recall@k", "mrr", "exact_match"])
+    parser.add_argument("--repeat", type=int, default=10, help="replays of the question set for latency percentiles")
+    parser.add_argument("--out", default="eval_results.json")
+    args = parser.parse_args()
+
+    from rag import rag_engine
+    if args.model:
+        rag_engine.EMBED_MODEL = args.model
+
+    paths = args.datasets.split(",")
+    ks = [int(k) for k in args.k.split(",")]
+    chunkings = [tuple(int(x) for x in c.split(":")) for c in args.chunks.split(",")]
+    pipelines = set(args.pipelines.split(","))
+
+    docs = load_datasets(paths)
+    questions, duplicates = gold_questions(docs)
+    pairs = sum(len(d["qa_pairs"]) for d in docs)
+    print(f"📚 {len(questions)} distinct questions ({pairs} QA pairs) from {', '.join(paths)}; "
+          f"latency over {args.repeat} replays = {len(questions) * args.repeat} samples per row")
+    if duplicates:
+        print(f"⚠️ {len(duplicates)} questions appear more than once ({sum(duplicates.values())} pairs); "
+              f"each is asked once and any of its answers counts as a hit")
+
+    backends = args.backends.split(",")
+
+    # load the model (and start Chroma) before any memory or latency is measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        dim = len(rag_engine.get_embeddings().embed_query("warm up"))
+        if "chroma" in backends:
+            drop(rag_engine.build_index(["warm up"], [{}], backend="chroma"))
+
+    configs = []
+    for backend in backends:
+        for quantization in (args.quantization.split(",") if backend == "numpy" else ["none"]):
+            configs.append((backend, quantization))
+
+    rows = []
+    for backend, quantization in configs:
+        modes = [m for m in ("engine", "vector") if m in pipelines]
+        if modes:
+            print(f"⏱ {'+'.join(modes)} {backend}/{quantization}")
+            rows += eval_engine(docs, questions, dim, backend, quantization, ks, modes, args.repeat)
+        if "chunked" in pipelines:
+            for chunk_size, chunk_overlap in chunkings:
+                print(f"⏱ chunked {backend}/{quantization} {chunk_size}:{chunk_overlap}")
+                rows += eval_chunked(paths, questions, dim, backend, quantization, chunk_size, chunk_overlap, ks, args.repeat)
+
+    print()
+    print_table(rows)
+
+    best = fastest_meeting(rows, args.floor, args.floor_metric)
+    served = sum(1 for r in rows if r["lookup_hit_rate"])
+    if served:
+        print(f"\nℹ️ {served} rows served by the exact qa_dict lookup are left out of the recommendation")
+    if best:
+        print(f"\n✅ fastest with {args.floor_metric} >= {args.floor}: "
+              f"{best['pipeline']} {best['backend']}/{best['quantization']} chunks={best['chunks']} k={best['k']} "
+              f"(p95 {best['p95_ms']} ms, {args.floor_metric} {best[args.floor_metric]})")
+    else:
+        print(f"\n⚠️ no configuration reaches {args.floor_metric} >= {args.floor}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {"timestamp": datetime.utcnow().isoformat(), "model": rag_engine.EMBED_MODEL,
+                     "questions": len(questions), "qa_pairs": pairs, "duplicate_questions": duplicates,
+                     "args": vars(args)},
+            "recommended": best,
+            "rows": rows,
+        }, f, indent=2)
+    print(f"💾 results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# measure.py
+# Small timing/memory helpers shared by the benchmark and evaluation scripts.
+import math, os, sys, time
+
+
+def percentiles(samples_s):
+    """Latency summary in milliseconds (nearest-rank percentiles)."""
+    if not samples_s:
+        return {"n": 0}
+    xs = sorted(samples_s)
+    at = lambda p: xs[max(0, math.ceil(p * len(xs) / 100) - 1)] * 1000
+    return {
+        "n": len(xs),
+        "mean_ms": round(sum(xs) / len(xs) * 1000, 3),
+        "p50_ms": round(at(50), 3),
+        "p95_ms": round(at(95), 3),
+        "p99_ms": round(at(99), 3),
+        "max_ms": round(xs[-1] * 1000, 3),
+    }
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Timer:
+    """`with Timer() as t: ...` -> t.seconds"""
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._t0
+        return False
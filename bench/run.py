@@ -0,0 +1,311 @@
+# run.py
+# Offline benchmark of the scrape -> store -> index -> query pipeline.
+#
+#   python -m bench.run                          # stand-ins for RabbitMQ/Mongo/Postgres
+#   python -m bench.run --real                   # MONGO_URI / PG_* from .env when reachable
+#   python -m bench.run --compare old.json       # print deltas against an earlier run
+#
+# Pages come from a local HTTP server (bench/corpus.py), so nothing here
+# touches live sites. Results are written as JSON (--out) for run-to-run
+# comparison.
+import argparse, contextlib, importlib.util, io, json, os, platform, random
+import socket, subprocess, threading, time, tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the benchmark builds its own in-memory index and talks to its own API
+for var in ("RAG_SHARD_URLS", "RAG_SHARD_COUNT", "RAG_INDEX_DIR"):
+    os.environ.pop(var, None)
+os.environ["RATE_LIMIT_PER_HOUR"] = str(10**9)
+
+from bench.corpus import PageServer, WORDS
+from bench.measure import percentiles, rss_mb, Timer
+from bench import standins
+
+API_KEY = "student-key-123"
+OVERHEAD_ROUNDS = 3   # alternating metrics off/on runs per endpoint
+WORKER_STAGES = ("fetch", "parse", "ids", "postgres", "mongo", "ack")
+
+
+def load_worker():
+    # queue/ shadows the stdlib module name, so load worker.py by path
+    spec = importlib.util.spec_from_file_location("rag_worker", os.path.join(ROOT, "queue", "worker.py"))
+    worker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(worker)
+    return worker
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+
+def bench_parse(worker, server, counters):
+    """clean_and_make_qa alone, over pages already in memory."""
+    worker.counters_col = counters
+    items = [(url, server.pages[url[len(server.base_url):]]) for url in server.urls]
+
+    latencies = []
+    with Timer() as total:
+        for url, html in items:
+            t0 = time.perf_counter()
+            worker.clean_and_make_qa(html, url)
+            latencies.append(time.perf_counter() - t0)
+
+    sample = items[:min(50, len(items))]
+    tracemalloc.start()
+    for url, html in sample:
+        worker.clean_and_make_qa(html, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pages": len(items),
+        "seconds": round(total.seconds, 3),
+        "pages_per_s": round(len(items) / total.seconds, 1),
+        "latency": percentiles(latencies),
+        "peak_alloc_mb": round(peak / 2**20, 2),
+    }
+
+
+def stage_totals(registry):
+    return {s: (registry.get_sample_value("worker_stage_seconds_sum", {"stage": s}) or 0.0,
+                registry.get_sample_value("worker_stage_seconds_count", {"stage": s}) or 0.0)
+            for s in WORKER_STAGES}
+
+
+def bench_worker(worker, server, real):
+    """consume() end to end: queue -> fetch -> Postgres -> parse -> Mongo -> ack."""
+    from prometheus_client import REGISTRY
+
+    clean_col, counters_col, mongo_label = standins.mongo_collections(real)
+    pg, pg_label = standins.postgres(real)
+    worker.pg, worker.clean_col, worker.counters_col = pg, clean_col, counters_col
+
+    ch = standins.FakeChannel()
+    for url in server.urls:
+        ch.basic_publish(exchange="", routing_key="urls", body=json.dumps({"url": url}))
+
+    before, rss0 = stage_totals(REGISTRY), rss_mb()
+    with Timer() as total, contextlib.redirect_stdout(io.StringIO()):
+        worker.consume(ch, stop_when_idle=True)
+    after = stage_totals(REGISTRY)
+
+    stages = {}
+    for s in WORKER_STAGES:
+        secs, n = after[s][0] - before[s][0], after[s][1] - before[s][1]
+        stages[s] = {"mean_ms": round(secs / n * 1000, 3) if n else None, "total_s": round(secs, 3)}
+
+    docs = list(clean_col.find({}, {"qa_pairs": 1}))
+    return {
+        "backends": {"rabbitmq": "stand-in", "mongo": mongo_label, "postgres": pg_label},
+        "pages": len(server.urls),
+        "seconds": round(total.seconds, 3),
+        "pages_per_s": round(len(server.urls) / total.seconds, 1),
+        "qa_pairs": sum(len(d["qa_pairs"]) for d in docs),
+        "unacked": len(ch.unacked),
+        "stages": stages,
+        "rss_delta_mb": round(rss_mb() - rss0, 1),
+    }, docs
+
+
+def bench_index(docs):
+    """rag_engine.load() over the worker's output (embedding model + Chroma)."""
+    from rag import rag_engine
+
+    rss0 = rss_mb()
+    with Timer() as total, contextlib.redirect_stdout(io.StringIO()):
+        try:
+            rag_engine.load(docs)
+        except ImportError as e:
+            return {"skipped": f"{type(e).__name__}: {e}"}
+
+    return {
+        "pairs": rag_engine.status["loaded_pairs"],
+        "seconds": round(total.seconds, 3),
+        "pairs_per_s": round(rag_engine.status["loaded_pairs"] / total.seconds, 1),
+        "phase_seconds": rag_engine.status["phase_seconds"],
+        "index_version": rag_engine.status["index_version"],
+        "rss_delta_mb": round(rss_mb() - rss0, 1),
+    }
+
+
+@contextlib.contextmanager
+def api_server():
+    import uvicorn
+    from api.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def run_load(base_url, make_request, n_requests, concurrency):
+    import requests
+
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers["X-API-Key"] = API_KEY
+        method, path, body = make_request(i)
+        t0 = time.perf_counter()
+        r = local.session.request(method, base_url + path, json=body, timeout=30)
+        return time.perf_counter() - t0, r.status_code
+
+    with Timer() as total, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+
+    latencies = [t for t, code in results if code == 200]
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, code in results if code != 200),
+        "rps": round(n_requests / total.seconds, 1),
+        "latency": percentiles(latencies),
+    }
+
+
+def bench_api(n_requests, concurrency):
+    """/query and /search through uvicorn under concurrent clients."""
+    from rag import rag_engine
+
+    questions = [meta["question"] for _, meta in rag_engine.qa_dict.values()]
+    rng = random.Random(0)
+    keywords = [" ".join(rng.sample(WORDS, 3)) for _ in range(64)]
+
+    def query(i):
+        # alternate exact-match hits and free-text (vector) questions
+        q = questions[i % len(questions)] if i % 2 == 0 else keywords[i % len(keywords)]
+        return "POST", "/query", {"question": q, "top_k": 5}
+
+    def search(i):
+        return "POST", "/search", {"query": WORDS[i % len(WORDS)], "limit": 5}
+
+    from api import main as api_main
+
+    out = {}
+    with api_server() as base_url:
+        if rag_engine.status["ready"]:
+            out["query"] = run_load(base_url, query, n_requests, concurrency)
+        else:
+            out["query"] = {"skipped": "vector index not built"}
+        out["search"] = run_load(base_url, search, n_requests, concurrency)
+
+        # the same load with the request-latency middleware on and off, in
+        # rounds that alternate which goes first (after the runs above warmed
+        # everything up); the difference is what metrics cost each request
+        overhead = {}
+        for name, make_request in (("query", query), ("search", search)):
+            if "skipped" in out[name]:
+                continue
+            runs = {True: [], False: []}
+            for i in range(OVERHEAD_ROUNDS):
+                for enabled in ((True, False) if i % 2 else (False, True)):
+                    api_main.METRICS_ENABLED = enabled
+                    runs[enabled].append(run_load(base_url, make_request, n_requests, concurrency)["latency"])
+            api_main.METRICS_ENABLED = True
+            mean = lambda lats, key: round(sum(l[key] for l in lats) / len(lats), 3)
+            overhead[name] = {
+                "mean_ms_on": mean(runs[True], "mean_ms"),
+                "mean_ms_off": mean(runs[False], "mean_ms"),
+                "mean_delta_ms": round(mean(runs[True], "mean_ms") - mean(runs[False], "mean_ms"), 3),
+                "p50_delta_ms": round(mean(runs[True], "p50_ms") - mean(runs[False], "p50_ms"), 3),
+            }
+        out["metrics_overhead"] = overhead
+    return out
+
+
+# ----------------------------
+# Results
+# ----------------------------
+
+def flatten(d, prefix=""):
+    for k, v in d.items():
+        path = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            yield from flatten(v, path)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield path, v
+
+
+def compare(old, new):
+    before = dict(flatten(old.get("results", {})))
+    print(f"\n📊 compared with {old.get('meta', {}).get('commit')} ({old.get('meta', {}).get('timestamp')})")
+    for path, value in flatten(new["results"]):
+        if path in before and before[path]:
+            change = (value - before[path]) / abs(before[path]) * 100
+            print(f"  {path:<45} {before[path]:>12} -> {value:<12} {change:+.1f}%")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG Scraper pipeline benchmark")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400, help="requests per API endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stages", default="parse,worker,index,api",
+                        help="the worker stage always runs: it produces the corpus for index/api")
+    parser.add_argument("--real", action="store_true", help="use MongoDB/Postgres from .env when reachable")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+    stages = set(args.stages.split(","))
+
+    results = {}
+    worker = load_worker()
+    with PageServer(args.pages) as server:
+        if "parse" in stages:
+            print("⏱ clean_and_make_qa...")
+            results["parse"] = bench_parse(worker, server, standins.FakeCollection())
+        print("⏱ worker end to end...")
+        results["worker"], docs = bench_worker(worker, server, args.real)
+
+    if "index" in stages or "api" in stages:
+        print("⏱ index build...")
+        results["index"] = bench_index(docs)
+    if "api" in stages:
+        print("⏱ API under load...")
+        results["api"] = bench_api(args.requests, args.concurrency)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"💾 results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# standins.py
+# In-process stand-ins for RabbitMQ, MongoDB and Postgres. They implement
+# only the calls queue/worker.py and rag/rag_engine.py make, with the same
+# return shapes, so the real code paths run unchanged against them.
+import os, threading
+from collections import deque
+from types import SimpleNamespace
+
+
+class FakeCollection:
+    """The slice of a pymongo Collection the worker and RAG engine use."""
+
+    def __init__(self):
+        self.docs = []
+        self._lock = threading.Lock()
+
+    def insert_one(self, doc):
+        with self._lock:
+            self.docs.append(dict(doc))
+
+    def find(self, filter=None, projection=None):
+        return iter(list(self.docs))
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    def find_one_and_update(self, filter, update, upsert=False, return_document=None):
+        # only {"$inc": {...}} with ReturnDocument.BEFORE is needed (allocate_global_ids)
+        with self._lock:
+            doc = next((d for d in self.docs if all(d.get(k) == v for k, v in filter.items())), None)
+            before = dict(doc) if doc else None
+            if doc is None and upsert:
+                doc = dict(filter)
+                self.docs.append(doc)
+            for field, n in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + n
+            return before
+
+
+class FakePostgres:
+    """psycopg2 connection stand-in: keeps row count and bytes written."""
+
+    def __init__(self):
+        self.autocommit = True
+        self.rows = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            self.rows += 1
+            self.bytes += sum(len(p) for p in params if isinstance(p, str))
+
+    def close(self):
+        pass
+
+
+class FakeChannel:
+    """pika BlockingChannel stand-in backed by a deque per queue."""
+
+    def __init__(self):
+        self.queues = {}
+        self.unacked = {}
+        self._tag = 0
+
+    def queue_declare(self, queue, durable=False, passive=False):
+        q = self.queues.setdefault(queue, deque())
+        return SimpleNamespace(method=SimpleNamespace(message_count=len(q)))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.queues.setdefault(routing_key, deque()).append(body.encode("utf-8") if isinstance(body, str) else body)
+
+    def basic_get(self, queue, auto_ack=False):
+        q = self.queues.setdefault(queue, deque())
+        if not q:
+            return None, None, None
+        self._tag += 1
+        body = q.popleft()
+        if not auto_ack:
+            self.unacked[self._tag] = body
+        return SimpleNamespace(delivery_tag=self._tag), None, body
+
+    def basic_ack(self, delivery_tag):
+        self.unacked.pop(delivery_tag, None)
+
+
+# ----------------------------
+# Real services, when asked for and reachable
+# ----------------------------
+
+def mongo_collections(real: bool = False):
+    """(clean_pages, counters, label). Real runs use the <MONGO_DB>_bench database."""
+    if real and os.getenv("MONGO_URI"):
+        try:
+            from pymongo import MongoClient
+            client = MongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=1000)
+            client.admin.command("ping")
+            db = client[f"{os.getenv('MONGO_DB', 'rag_scraper')}_bench"]
+            db["clean_pages"].drop()
+            db["counters"].drop()
+            return db["clean_pages"], db["counters"], "mongodb"
+        except Exception as e:
+            print(f"⚠️ MongoDB unavailable ({e}); using in-process stand-in")
+    return FakeCollection(), FakeCollection(), "stand-in"
+
+
+def postgres(real: bool = False):
+    """
+    (connection, label). Real runs write to a session-local TEMP raw_pages,
+    which shadows the real table for the worker's unqualified INSERT and is
+    dropped on disconnect, so PG_DB's data is never touched.
+    """
+    if real and os.getenv("PG_HOST"):
+        try:
+            import psycopg2
+            conn = psycopg2.connect(
+                host=os.getenv("PG_HOST"), port=os.getenv("PG_PORT"), dbname=os.getenv("PG_DB"),
+                user=os.getenv("PG_USER"), password=os.getenv("PG_PASSWORD"), connect_timeout=2,
+            )
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                try:
+                    # same columns, defaults and indexes as the real table
+                    cur.execute("CREATE TEMP TABLE raw_pages (LIKE public.raw_pages INCLUDING ALL)")
+                except psycopg2.errors.UndefinedTable:
+                    cur.execute("CREATE TEMP TABLE raw_pages (id SERIAL PRIMARY KEY, url TEXT, html TEXT)")
+            return conn, "postgres (temp table)"
+        except Exception as e:
+            print(f"⚠️ Postgres unavailable ({e}); using in-process stand-in")
+    return FakePostgres(), "stand-in"
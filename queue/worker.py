@@ -1,4 +1,4 @@
-import os, json, time, re
+import os, sys, json, time, re, signal, threading
 import pika, requests
 from bs4 import BeautifulSoup
 from dask import delayed, compute
@@ -9,9 +9,15 @@ from bs4 import BeautifulSoup
 import re
 from pymongo import MongoClient, ReturnDocument
 from urllib.parse import urlparse
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, for rag.*
+from rag import profiler
 
 load_dotenv()
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+PROFILE_SECONDS = float(os.getenv("WORKER_PROFILE_SECONDS", "30"))
 
 PG_CONN = dict(
     host=os.getenv("PG_HOST"),
@@ -20,7 +26,6 @@ PG_CONN = dict(
     user=os.getenv("PG_USER"),
     password=os.getenv("PG_PASSWORD"),
 )
-print("DEBUG: PG_PASSWORD =", PG_CONN["password"])  # TEMP
 
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB  = os.getenv("MONGO_DB")
@@ -31,12 +36,25 @@ HEADERS = {
                    "Chrome/120.0.0.0 Safari/537.36")
 }
 
-# --- DB clients ---
-pg = psycopg2.connect(**PG_CONN)
-pg.autocommit = True
-mongo = MongoClient(MONGO_URI)[MONGO_DB]
-clean_col = mongo["clean_pages"]
-counters_col = mongo["counters"]
+# --- metrics (served on WORKER_METRICS_PORT) ---
+STAGE_BUCKETS = (.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+STAGE_SECONDS = Histogram("worker_stage_seconds", "Time per pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+PAGES = Counter("worker_pages_total", "Pages scraped and stored (rate() = pages/sec)")
+QA_PAIRS = Counter("worker_qa_pairs_total", "QA pairs written to MongoDB")
+QUEUE_DEPTH = Gauge("worker_queue_depth", "Messages waiting in the 'urls' queue")
+
+# --- DB clients (opened by connect(), so importing this module has no side effects) ---
+pg = None
+clean_col = None
+counters_col = None
+
+def connect():
+    global pg, clean_col, counters_col
+    pg = psycopg2.connect(**PG_CONN)
+    pg.autocommit = True
+    mongo = MongoClient(MONGO_URI)[MONGO_DB]
+    clean_col = mongo["clean_pages"]
+    counters_col = mongo["counters"]
 
 def store_raw_postgres(url: str, html: str):
     with pg.cursor() as cur:
@@ -56,7 +74,7 @@ def allocate_global_ids(n: int) -> int:
     start = (doc["seq"] if doc and "seq" in doc else 0)
     return start  # caller will add +1 when displaying as 1-based
 
-def clean_and_make_qa(html: str, url: str):
+def extract_sentences(html: str):
     soup = BeautifulSoup(html, "html.parser")
     for tag in soup(["script", "style", "header", "footer", "nav", "aside", "form", "svg"]):
         tag.decompose()
@@ -66,11 +84,16 @@ def clean_and_make_qa(html: str, url: str):
 
     # Split into sentences or short chunks (keep it simple)
     sentences = [s.strip() for s in text.split(". ") if s.strip()]
-    sentences = sentences[:10]  # keep first 10 for demo
+    return sentences[:10]  # keep first 10 for demo
+
+def clean_and_make_qa(html: str, url: str):
+    sentences = extract_sentences(html)
 
     # Allocate global IDs once for this page
     start_idx = allocate_global_ids(len(sentences))  # 0-based
+    return make_qa_pairs(sentences, url, start_idx)
 
+def make_qa_pairs(sentences, url: str, start_idx: int):
     qa_pairs = []
     netloc = urlparse(url).netloc
 
@@ -97,17 +120,76 @@ def clean_and_make_qa(html: str, url: str):
 
 @delayed
 def scrape_and_store(url: str):
-    r = requests.get(url, headers=HEADERS, timeout=30)
-    html = r.text
+    with STAGE_SECONDS.labels("fetch").time():
+        r = requests.get(url, headers=HEADERS, timeout=30)
+        html = r.text
     # 1) raw -> Postgres
-    store_raw_postgres(url, html)
+    with STAGE_SECONDS.labels("postgres").time():
+        store_raw_postgres(url, html)
     # 2) cleaned -> Mongo
-    qa_pairs = clean_and_make_qa(html, url)
-    clean_col.insert_one({"url": url, "qa_pairs": qa_pairs, "ts": time.time()})
+    # clean_and_make_qa split up, so the global-id round trip to Mongo
+    # gets its own stage instead of inflating "parse"
+    t0 = time.perf_counter()
+    sentences = extract_sentences(html)
+    parse_s = time.perf_counter() - t0
+    with STAGE_SECONDS.labels("ids").time():
+        start_idx = allocate_global_ids(len(sentences))
+    t0 = time.perf_counter()
+    qa_pairs = make_qa_pairs(sentences, url, start_idx)
+    STAGE_SECONDS.labels("parse").observe(parse_s + time.perf_counter() - t0)
+    with STAGE_SECONDS.labels("mongo").time():
+        clean_col.insert_one({"url": url, "qa_pairs": qa_pairs, "ts": time.time()})
+    PAGES.inc()
+    QA_PAIRS.inc(len(qa_pairs))
     return {"url": url, "qa_count": len(qa_pairs)}
 
+# --- opt-in profiler: `kill -USR1 <pid>` writes a folded-stack flamegraph ---
+def profile_on_signal(signum, frame):
+    path = f"worker-profile-{int(time.time())}.folded"
+    print(f"🔬 profiling for {PROFILE_SECONDS:g}s -> {path}")
+    threading.Thread(target=profiler.dump, args=(path, PROFILE_SECONDS), daemon=True).start()
+
 # --- RabbitMQ consumer loop (batch for Dask) ---
+def consume(ch, stop_when_idle: bool = False):
+    """
+    Process 'urls' in batches of 10 until interrupted. With stop_when_idle
+    it returns once the queue is empty (used by bench/run.py).
+    """
+    while True:
+        depth = ch.queue_declare(queue="urls", durable=True, passive=True)
+        QUEUE_DEPTH.set(depth.method.message_count)
+
+        batch = []
+        for _ in range(10):
+            method, props, body = ch.basic_get(queue="urls", auto_ack=False)
+            if not body:
+                break
+            msg = json.loads(body.decode("utf-8"))
+            url = msg["url"]
+            batch.append((method.delivery_tag, url))
+        if not batch:
+            if stop_when_idle:
+                return
+            time.sleep(1)
+            continue
+
+        print(f"⚙️ processing batch of {len(batch)} urls with Dask...")
+        tasks = [scrape_and_store(url) for _, url in batch]
+        results = compute(*tasks)
+
+        # ack after processing
+        for (delivery_tag, _), res in zip(batch, results):
+            print(" done:", res)
+            with STAGE_SECONDS.labels("ack").time():
+                ch.basic_ack(delivery_tag)
+
 def main():
+    connect()
+    start_http_server(WORKER_METRICS_PORT)
+    print(f"📈 metrics on :{WORKER_METRICS_PORT}/metrics")
+    if profiler.PROFILER_ENABLED and hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, profile_on_signal)
+
     params = pika.URLParameters(RABBITMQ_URL)
     conn = pika.BlockingConnection(params)
     ch = conn.channel()
@@ -115,27 +197,7 @@ def main():
     print("👂 waiting for messages on 'urls'... (Ctrl+C to stop)")
 
     try:
-        while True:
-            batch = []
-            for _ in range(10):
-                method, props, body = ch.basic_get(queue="urls", auto_ack=False)
-                if not body:
-                    break
-                msg = json.loads(body.decode("utf-8"))
-                url = msg["url"]
-                batch.append((method.delivery_tag, url))
-            if not batch:
-                time.sleep(1)
-                continue
-
-            print(f"⚙️ processing batch of {len(batch)} urls with Dask...")
-            tasks = [scrape_and_store(url) for _, url in batch]
-            results = compute(*tasks)
-
-            # ack after processing
-            for (delivery_tag, _), res in zip(batch, results):
-                print(" done:", res)
-                ch.basic_ack(delivery_tag)
+        consume(ch)
     finally:
         conn.close()
 
@@ -0,0 +1,71 @@
+# metrics.py
+import time
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# ----------------------------
+# Prometheus metrics (API + RAG engine)
+# ----------------------------
+# Scraped from GET /metrics on the API. The worker exports its own set on
+# WORKER_METRICS_PORT (see queue/worker.py).
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+EMBED_SECONDS = Histogram(
+    "rag_embed_seconds", "Time to embed one query", buckets=LATENCY_BUCKETS
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "rag_vector_search_seconds", "Nearest-neighbour search time, excluding embedding",
+    ["mode"], buckets=LATENCY_BUCKETS      # mode: local | shards
+)
+EXACT_LOOKUPS = Counter(
+    "rag_exact_lookups_total", "qa_dict exact-question lookups", ["result"]   # hit | miss
+)
+SHARD_FAILURES = Counter(
+    "rag_shard_failures_total", "Shard queries left out of a merge", ["reason"]  # error | timeout
+)
+REQUEST_SECONDS = Histogram(
+    "api_request_seconds", "API latency until response headers are sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+
+
+def render():
+    """(body, content_type) for a /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ----------------------------
+# Per-update cost: python -m rag.metrics
+# ----------------------------
+# Isolated metric calls only; the end-to-end request overhead (middleware
+# included) is bench/run.py's api.metrics_overhead.
+if __name__ == "__main__":
+    n = 200_000
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        pass
+    base = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        REQUEST_SECONDS.labels("GET", "/bench", 200).observe(0.003)
+    labelled = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with EMBED_SECONDS.time():
+            pass
+    timed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        EXACT_LOOKUPS.labels("hit").inc()
+    counted = time.perf_counter() - t0
+
+    per_call = lambda t: (t - base) / n * 1e6
+    print(f"📏 labelled histogram observe: {per_call(labelled):.2f} µs")
+    print(f"📏 histogram .time() block:     {per_call(timed):.2f} µs")
+    print(f"📏 labelled counter inc:        {per_call(counted):.2f} µs")
+    print(f"📏 /query engine metric ops:    {per_call(timed) * 2 + per_call(counted):.2f} µs "
+          f"(request overhead: python -m bench.run -> api.metrics_overhead)")
@@ -1,63 +1,276 @@
 # rag_engine.py
-import os, re
+import os, re, time, uuid, shutil, signal, hashlib, threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from rag.sharding import SHARD_ID, SHARD_COUNT, SHARD_URLS, owns, scatter_search
+from rag.metrics import EMBED_SECONDS, VECTOR_SEARCH_SECONDS, EXACT_LOOKUPS
 
 # ----------------------------
-# Initialize RAG Engine ONCE
+# Configuration
 # ----------------------------
+# Importing this module is cheap: MongoDB, langchain and torch are only
+# touched by load(), which the API runs on a background thread so uvicorn
+# binds its port at once and /health can report how far loading has got.
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB  = os.getenv("MONGO_DB", "rag_scraper")
 
-print("🔌 Connecting to MongoDB...")
-mongo = MongoClient(MONGO_URI)[MONGO_DB]
-clean_col = mongo["clean_pages"]
+EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "256"))   # texts per add_texts call
+INDEX_DIR   = os.getenv("RAG_INDEX_DIR")                  # reuse built indexes across restarts
+INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "chroma")  # chroma | numpy
+QUANTIZATION  = os.getenv("RAG_QUANTIZATION", "none")     # numpy backend: none | float16 | int8
+READY_MARKER = ".ready"
+LOAD_RETRIES = int(os.getenv("RAG_LOAD_RETRIES", "5"))        # background load attempts after the first
+LOAD_BACKOFF = float(os.getenv("RAG_LOAD_BACKOFF", "5"))      # seconds, doubled per retry
+LOAD_BACKOFF_MAX = float(os.getenv("RAG_LOAD_BACKOFF_MAX", "120"))
+EXIT_ON_GIVE_UP = os.getenv("RAG_EXIT_ON_GIVE_UP", "1") == "1"   # stop the server so its restart policy kicks in
 
-texts = []       # what we embed (answers only)
-metadatas = []   # metadata for each QA pair
-qa_dict = {}     # exact question lookup
+# Sharded mode: a shard process (RAG_SHARD_COUNT > 1) embeds only the pairs
+# it owns; an API replica with RAG_SHARD_URLS keeps the text for exact
+# lookups and paging but leaves vectors (and the model) to the shards.
+is_shard = SHARD_COUNT > 1
+is_coordinator = bool(SHARD_URLS) and not is_shard
+
+# ----------------------------
+# Engine state (published by load())
+# ----------------------------
+
+texts = []          # what we embed (answers only)
+metadatas = []      # metadata for each QA pair
+qa_dict = {}        # exact question lookup
+qa_order = []       # qa_dict keys in stable (global_part, question) order
+qa_order_keys = []  # sort key of each qa_order entry, for cursor bisects
+embeddings = None
+vectorstore = None
+
+status = {
+    "phase": "idle",        # idle -> connect -> load_corpus -> load_model -> build_index -> ready | failed
+    "progress": 0.0,        # 0..1 within the current phase
+    "corpus_ready": False,  # qa_dict usable (paging, exact lookups)
+    "ready": False,         # vector search usable
+    "loaded_pairs": 0,
+    "index_version": None,
+    "phase_seconds": {},
+    "error": None,
+    "attempts": 0,          # background load attempts so far
+    "retry_in": None,       # seconds until the next attempt after a failure
+    "gave_up": False,       # retries exhausted; the process exits (RAG_EXIT_ON_GIVE_UP)
+}
+
+_load_lock = threading.Lock()
+_load_thread = None
+
+
+@contextmanager
+def _phase(name: str):
+    status["phase"], status["progress"] = name, 0.0
+    t0 = time.perf_counter()
+    yield
+    status["phase_seconds"][name] = round(time.perf_counter() - t0, 3)
+    print(f"⏱ {name} took {status['phase_seconds'][name]}s")
+
+
+def _tracked(docs, total):
+    for i, doc in enumerate(docs, 1):
+        yield doc
+        if total:
+            status["progress"] = min(i / total, 1.0)
+
+
+# ----------------------------
+# Loading
+# ----------------------------
+
+def order_key(q: str, meta: dict):
+    return (meta.get("global_part") or 0, q)
+
+
+def load_qa_pairs(docs):
+    """Flatten `clean_pages` documents into (texts, metadatas, qa_dict)."""
+    texts, metadatas, qa = [], [], {}
+    for doc in docs:
+        for p in doc["qa_pairs"]:
+            q = (p.get("question") or "").strip()
+            a = (p.get("answer") or "").strip()
+            meta = p.get("meta") or {}
+
+            if is_shard and not owns(q, meta):
+                continue
+
+            if q and a:
+                texts.append(a)
+                metadatas.append({
+                    "question": q,
+                    "url": meta.get("url"),
+                    "domain": meta.get("domain"),
+                    "global_part": meta.get("global_part"),
+                    "local_part": meta.get("local_part"),
+                })
+                qa[q.lower()] = (a, metadatas[-1])
+    return texts, metadatas, qa
+
+
+def index_version(texts, metadatas) -> str:
+    """Content hash of what gets embedded; changes whenever the index would."""
+    h = hashlib.sha1(EMBED_MODEL.encode("utf-8"))
+    for t, m in zip(texts, metadatas):
+        h.update(m["question"].encode("utf-8"))
+        h.update(b"\0")
+        h.update(t.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:12]
 
-count = 0
-print("📥 Loading QA pairs from MongoDB...")
-for doc in clean_col.find({}, {"qa_pairs": 1}):
-    for p in doc["qa_pairs"]:
-        q = (p.get("question") or "").strip()
-        a = (p.get("answer") or "").strip()
-        meta = p.get("meta") or {}
 
-        if q and a:
-            texts.append(a)
-            metadatas.append({
-                "question": q,
-                "url": meta.get("url"),
-                "domain": meta.get("domain"),
-                "global_part": meta.get("global_part"),
-                "local_part": meta.get("local_part"),
-            })
+def get_embeddings():
+    global embeddings
+    if embeddings is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        print("🧠 Creating embedding model...")
+        embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+    return embeddings
 
-            qa_dict[q.lower()] = (a, metadatas[-1])
-            count += 1
 
-print(f"✅ Loaded {count} QA pairs into memory")
+def build_index(texts, metadatas, version: str = None, backend: str = None, quantization: str = None):
+    """
+    Embed texts into a vector index in batches (so progress is visible).
+    With RAG_INDEX_DIR set, a Chroma index already built for this version
+    is opened from disk instead of re-embedded; the numpy backend always
+    builds in memory.
+    """
+    backend = backend or INDEX_BACKEND
+    emb = get_embeddings()
 
-print("🧠 Creating embedding model...")
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+    if backend == "numpy":
+        from rag.vector_index import NumpyIndex
+        print(f"🗂 Building numpy vector index in RAM (quantization={quantization or QUANTIZATION})...")
+        store = NumpyIndex(emb, quantization or QUANTIZATION)
+        for i in range(0, len(texts), EMBED_BATCH):
+            store.add_texts(texts[i:i + EMBED_BATCH], metadatas=metadatas[i:i + EMBED_BATCH])
+            status["progress"] = min((i + EMBED_BATCH) / len(texts), 1.0)
+        return store
+    if backend != "chroma":
+        raise ValueError(f"Unknown RAG_INDEX_BACKEND {backend!r} (expected chroma or numpy)")
 
-print("🗂 Building Chroma vector index in RAM...")
-vectorstore = Chroma.from_texts(
-    texts=texts,
-    embedding=embeddings,
-    metadatas=metadatas
-)
+    from langchain_community.vectorstores import Chroma
 
-print("🚀 RAG Engine ready!")
+    persist_dir = os.path.join(INDEX_DIR, version) if INDEX_DIR and version else None
+
+    if persist_dir and os.path.exists(os.path.join(persist_dir, READY_MARKER)):
+        print(f"📂 Opening Chroma index {version} from disk...")
+        status["progress"] = 1.0
+        return Chroma(collection_name="qa_pairs", persist_directory=persist_dir, embedding_function=emb)
+
+    if persist_dir:
+        shutil.rmtree(persist_dir, ignore_errors=True)   # leftovers of an interrupted build
+        print(f"🗂 Building Chroma vector index {version} in {persist_dir}...")
+        store = Chroma(collection_name="qa_pairs", persist_directory=persist_dir, embedding_function=emb)
+    else:
+        # in-memory Chroma clients share collections per process, so keep names unique
+        print("🗂 Building Chroma vector index in RAM...")
+        store = Chroma(collection_name=f"qa_{version or 'adhoc'}_{uuid.uuid4().hex[:8]}", embedding_function=emb)
+
+    for i in range(0, len(texts), EMBED_BATCH):
+        # Chroma rejects None metadata values (pairs scraped without full meta)
+        batch_metas = [{k: v for k, v in m.items() if v is not None} for m in metadatas[i:i + EMBED_BATCH]]
+        store.add_texts(texts[i:i + EMBED_BATCH], metadatas=batch_metas)
+        status["progress"] = min((i + EMBED_BATCH) / len(texts), 1.0)
+
+    if persist_dir:
+        open(os.path.join(persist_dir, READY_MARKER), "w").close()
+    return store
+
+
+def load(docs=None, backend: str = None, quantization: str = None):
+    """
+    Load the corpus and build (or open) the vector index, publishing each
+    part as soon as it is usable. `docs` replaces the MongoDB read, which
+    lets benchmarks and evaluations feed in a corpus directly; `backend` and
+    `quantization` override RAG_INDEX_BACKEND / RAG_QUANTIZATION.
+    """
+    global texts, metadatas, qa_dict, qa_order, qa_order_keys, vectorstore
+
+    status.update(ready=False, error=None)
+    t_start = time.perf_counter()
+    try:
+        total = len(docs) if hasattr(docs, "__len__") else None
+        if docs is None:
+            with _phase("connect"):
+                from pymongo import MongoClient
+                print("🔌 Connecting to MongoDB...")
+                clean_col = MongoClient(MONGO_URI)[MONGO_DB]["clean_pages"]
+                total = clean_col.estimated_document_count()
+                docs = clean_col.find({}, {"qa_pairs": 1})
+
+        with _phase("load_corpus"):
+            if is_shard:
+                print(f"📥 Loading QA pairs for shard {SHARD_ID}/{SHARD_COUNT}...")
+            else:
+                print("📥 Loading QA pairs...")
+            new_texts, new_metas, new_qa = load_qa_pairs(_tracked(docs, total))
+            order = sorted(new_qa, key=lambda q: order_key(q, new_qa[q][1]))
+            keys = [order_key(q, new_qa[q][1]) for q in order]
+            version = index_version(new_texts, new_metas)
+
+        texts, metadatas, qa_dict, qa_order, qa_order_keys = new_texts, new_metas, new_qa, order, keys
+        status.update(corpus_ready=True, loaded_pairs=len(new_texts))
+        print(f"✅ Loaded {len(new_texts)} QA pairs into memory")
+
+        store = None
+        if is_coordinator:
+            print(f"🛰 Vector search delegated to {len(SHARD_URLS)} shard(s)")
+        elif new_texts:
+            with _phase("load_model"):
+                get_embeddings()
+            with _phase("build_index"):
+                store = build_index(new_texts, new_metas, version, backend, quantization)
+        vectorstore = store
+
+        status["phase_seconds"]["total"] = round(time.perf_counter() - t_start, 3)
+        status.update(phase="ready", progress=1.0, ready=True, index_version=version)
+        print("🚀 RAG Engine ready!")
+    except Exception as e:
+        status.update(phase="failed", error=f"{type(e).__name__}: {e}")
+        print(f"❌ RAG Engine failed to load: {e}")
+        raise
+
+
+def _load_with_retry():
+    """
+    load() with exponential backoff, so a MongoDB that comes up after the
+    API (or a transient model download error) doesn't leave it failed for
+    good. Once retries run out the process shuts itself down (SIGTERM, so
+    uvicorn exits cleanly) and the container's restart policy starts over.
+    """
+    delay = LOAD_BACKOFF
+    for attempt in range(1, LOAD_RETRIES + 2):
+        status.update(attempts=attempt, retry_in=None)
+        try:
+            load()
+            return
+        except Exception:
+            if attempt > LOAD_RETRIES:
+                break
+        status["retry_in"] = delay
+        print(f"🔁 Retrying load in {delay:g}s (attempt {attempt + 1}/{LOAD_RETRIES + 1})")
+        time.sleep(delay)
+        delay = min(delay * 2, LOAD_BACKOFF_MAX)
+    status["gave_up"] = True
+    print(f"💀 RAG Engine gave up after {status['attempts']} attempts")
+    if EXIT_ON_GIVE_UP:
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def start_background_load():
+    """Run load() (with retries) on a daemon thread; a no-op if loading already started."""
+    global _load_thread
+    with _load_lock:
+        if _load_thread is None and status["phase"] == "idle":
+            _load_thread = threading.Thread(target=_load_with_retry, name="rag-load", daemon=True)
+            _load_thread.start()
+    return _load_thread
 
 
 # ----------------------------
@@ -69,12 +282,13 @@ def extract_part_number(query: str):
     return int(m.group(1)) if m else None
 
 
-def smart_retrieval(query: str, k: int = 8):
+def smart_retrieval(query: str, k: int = 8, shards: dict = None):
     """Return best answer(s) from your QA dataset"""
     q_lower = query.lower()
 
     # ✅ Exact DB question match
     if q_lower in qa_dict:
+        EXACT_LOOKUPS.labels("hit").inc()
         answer, meta = qa_dict[q_lower]
         return [{
             "answer": answer,
@@ -84,25 +298,50 @@ def smart_retrieval(query: str, k: int = 8):
             "exact_match": True
         }]
 
-    # ✅ Vector search
-    docs = vectorstore.similarity_search(query, k=k)
+    EXACT_LOOKUPS.labels("miss").inc()
+
+    # ✅ Vector search (local index or scatter-gather over shards)
+    results = vector_search(query, k, shards)
     target_part = extract_part_number(query)
 
     # ✅ If user asked 'part N', filter exact part
     if target_part is not None:
-        filtered = [d for d in docs if d.metadata.get("global_part") == target_part]
+        filtered = [r for r in results if r["global_part"] == target_part]
         if filtered:
-            docs = filtered
+            results = filtered
+
+    return results
+
+
+def vector_search(query: str, k: int = 8, shards: dict = None):
+    """
+    Top-k nearest answers; `score` is the Chroma distance (lower = closer).
+    On a coordinator, pass a `shards` dict to get how many shards answered.
+    """
+    if is_coordinator:
+        with VECTOR_SEARCH_SECONDS.labels("shards").time():
+            results, responded = scatter_search(query, k)
+        if shards is not None:
+            shards.update(responded=responded, total=len(SHARD_URLS))
+        return results
+    if vectorstore is None:
+        return []
+
+    # embed and search separately so each gets its own histogram
+    with EMBED_SECONDS.time():
+        vector = get_embeddings().embed_query(query)
+    with VECTOR_SEARCH_SECONDS.labels("local").time():
+        hits = vectorstore.similarity_search_by_vector_with_relevance_scores(vector, k=k)
 
-    # ✅ Return formatted response
     results = []
-    for d in docs:
+    for d, score in hits:
         results.append({
             "answer": d.page_content.strip(),
             "question": d.metadata.get("question"),
             "url": d.metadata.get("url"),
             "global_part": d.metadata.get("global_part"),
-            "exact_match": False
+            "exact_match": False,
+            "score": float(score)
         })
     return results
 
@@ -111,6 +350,7 @@ def smart_retrieval(query: str, k: int = 8):
 # Local test ability (optional)
 # ----------------------------
 if __name__ == "__main__":
+    load()
     query = "What does the page say in part 8?"
     results = smart_retrieval(query)
 
@@ -0,0 +1,49 @@
+# run_shards.py
+# Start N shard processes on one box for local testing, e.g.
+#
+#   python -m rag.run_shards --shards 3
+#   RAG_SHARD_URLS=<printed list> uvicorn api.main:app
+import argparse, os, subprocess, sys, time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sharded vector index locally")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8101)
+    parser.add_argument("--shard-key", default=os.getenv("RAG_SHARD_KEY", "global_part"),
+                        choices=["global_part", "domain"])
+    args = parser.parse_args()
+
+    procs, urls = [], []
+    for i in range(args.shards):
+        port = args.base_port + i
+        env = dict(os.environ,
+                   RAG_SHARD_ID=str(i),
+                   RAG_SHARD_COUNT=str(args.shards),
+                   RAG_SHARD_KEY=args.shard_key)
+        env.pop("RAG_SHARD_URLS", None)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "rag.shard_server:app",
+             "--host", args.host, "--port", str(port)],
+            env=env
+        ))
+        urls.append(f"http://{args.host}:{port}")
+
+    print(f"🧩 started {args.shards} shard(s)")
+    print(f"RAG_SHARD_URLS={','.join(urls)}")
+
+    try:
+        while all(p.poll() is None for p in procs):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
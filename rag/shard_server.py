@@ -0,0 +1,60 @@
+# shard_server.py
+# One partition of the vector index. Meant for the internal network only:
+# API replicas reach it through rag.sharding.scatter_search, so there is no
+# API-key auth here.
+#
+#   RAG_SHARD_ID=0 RAG_SHARD_COUNT=2 uvicorn rag.shard_server:app --port 8101
+#
+# or start all of them locally with `python -m rag.run_shards`.
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel, Field
+
+from rag import rag_engine
+from rag.rag_engine import vector_search, SHARD_ID, SHARD_COUNT
+from rag.metrics import render as render_metrics
+
+app = FastAPI(title="RAG Shard", version="1.0.0")
+
+
+class ShardSearchRequest(BaseModel):
+    query: str
+    k: int = Field(8, ge=1, le=100)
+
+
+@app.on_event("startup")
+def warm_up():
+    rag_engine.start_background_load()
+
+
+@app.get("/health")
+def health(response: Response):
+    s = rag_engine.status
+    if not s["ready"]:
+        response.status_code = 503
+    return {
+        "status": "failed" if s["phase"] == "failed" else "ok",
+        "shard": SHARD_ID,
+        "shard_count": SHARD_COUNT,
+        "ready": s["ready"],
+        "phase": s["phase"],
+        "progress": round(s["progress"], 3),
+        "loaded_pairs": s["loaded_pairs"],
+        "index_version": s["index_version"],
+        "error": s["error"],
+        "attempts": s["attempts"],
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    # same registry as the API: embedding and local vector search timings
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.post("/search")
+def search(data: ShardSearchRequest):
+    # a loading shard answers 503 and the coordinator leaves it out of the merge
+    if not rag_engine.status["ready"]:
+        raise HTTPException(status_code=503, detail="Shard index is still loading")
+    return {"shard": SHARD_ID, "results": vector_search(data.query, data.k)}
@@ -0,0 +1,96 @@
+# sharding.py
+import os, zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from rag.metrics import SHARD_FAILURES
+
+# ----------------------------
+# Shard layout (from env)
+# ----------------------------
+# Shard process:  RAG_SHARD_ID=0 RAG_SHARD_COUNT=2  -> indexes only its partition
+# API replica:    RAG_SHARD_URLS=http://h:8101,http://h:8102 -> fans queries out
+
+SHARD_ID    = int(os.getenv("RAG_SHARD_ID", "0"))
+SHARD_COUNT = int(os.getenv("RAG_SHARD_COUNT", "1"))
+SHARD_KEY   = os.getenv("RAG_SHARD_KEY", "global_part")   # or "domain"
+SHARD_URLS  = [u.strip().rstrip("/") for u in os.getenv("RAG_SHARD_URLS", "").split(",") if u.strip()]
+SHARD_TIMEOUT = float(os.getenv("RAG_SHARD_TIMEOUT", "2.0"))   # seconds per query
+
+
+def shard_of(question: str, meta: dict, shard_count: int = SHARD_COUNT, key: str = SHARD_KEY) -> int:
+    """Which shard owns a QA pair. Must be identical in every process."""
+    if shard_count <= 1:
+        return 0
+    if key == "global_part" and isinstance(meta.get("global_part"), int):
+        return meta["global_part"] % shard_count
+    value = meta.get(key) or question
+    return zlib.crc32(str(value).encode("utf-8")) % shard_count
+
+
+def owns(question: str, meta: dict) -> bool:
+    return shard_of(question, meta) == SHARD_ID
+
+
+# ----------------------------
+# Scatter-gather coordinator
+# ----------------------------
+
+# Every in-flight request fans out to every shard at once, so the pool needs
+# a thread per (request, shard): with fewer, a slow shard's calls hold the
+# threads until the deadline and calls to healthy shards queue behind them.
+# Health probes get their own pool so readiness never waits on queries.
+API_CONCURRENCY = int(os.getenv("RAG_API_CONCURRENCY", "40"))   # FastAPI's sync threadpool size
+_fanout = API_CONCURRENCY * max(len(SHARD_URLS), 1)
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_maxsize=_fanout))
+_pool = ThreadPoolExecutor(max_workers=_fanout, thread_name_prefix="shard")
+_health_pool = ThreadPoolExecutor(max_workers=max(len(SHARD_URLS), 1) * 2, thread_name_prefix="shard-health")
+
+
+def _query_shard(url: str, query: str, k: int, timeout: float):
+    r = _session.post(f"{url}/search", json={"query": query, "k": k}, timeout=timeout)
+    r.raise_for_status()
+    return r.json()["results"]
+
+
+def _shard_ready(url: str, timeout: float) -> bool:
+    try:
+        return _session.get(f"{url}/health", timeout=timeout).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def shard_health(urls=None, timeout: float = SHARD_TIMEOUT) -> dict:
+    """{url: ready} from each shard's /health (503 while it is loading)."""
+    urls = urls or SHARD_URLS
+    futures = {u: _health_pool.submit(_shard_ready, u, timeout) for u in urls}
+    return {u: f.result() for u, f in futures.items()}
+
+
+def scatter_search(query: str, k: int, urls=None, timeout: float = SHARD_TIMEOUT):
+    """
+    Ask every shard for its top-k concurrently and merge by distance.
+    Shards that fail or miss the deadline are skipped, so one slow shard
+    degrades recall instead of latency. Returns (results, shards_responded).
+    """
+    urls = urls or SHARD_URLS
+    futures = {_pool.submit(_query_shard, u, query, k, timeout): u for u in urls}
+    done, pending = wait(futures, timeout=timeout)
+
+    merged, responded = [], 0
+    for f in done:
+        try:
+            merged.extend(f.result())
+            responded += 1
+        except Exception as e:
+            SHARD_FAILURES.labels("error").inc()
+            print(f"⚠️ shard {futures[f]} failed: {e}")
+    for f in pending:
+        f.cancel()
+        SHARD_FAILURES.labels("timeout").inc()
+        print(f"⏱ shard {futures[f]} timed out after {timeout}s")
+
+    merged.sort(key=lambda r: r["score"])
+    return merged[:k], responded
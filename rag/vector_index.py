@@ -0,0 +1,89 @@
+# vector_index.py
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+
+# ----------------------------
+# Brute-force in-process index (RAG_INDEX_BACKEND=numpy)
+# ----------------------------
+# Exact nearest neighbours over a dense matrix, with optional float16 or
+# int8 storage to trade a little accuracy for 2-4x less memory. Exposes the
+# slice of the Chroma vectorstore API that rag_engine and api/app.py call,
+# and scores with the same squared-L2 distance so results are comparable.
+
+QUANTIZATIONS = ("none", "float16", "int8")
+BLOCK_ROWS = 65536   # rows dequantized per matmul block, bounds temp memory
+
+
+class NumpyIndex:
+    def __init__(self, embedding_function, quantization: str = "none"):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization!r}")
+        self.embedding_function = embedding_function
+        self.quantization = quantization
+        self.texts = []
+        self.metadatas = []
+        self._blocks = []       # (stored vectors, per-row int8 scales or None)
+        self._norms = []        # squared norms of the vectors as stored
+        self._matrix = None     # concatenated on first search after adds
+
+    # -------- building --------
+
+    def add_texts(self, texts, metadatas=None):
+        texts = list(texts)
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas or [{} for _ in texts])
+
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.round(vectors / scales).astype(np.int8)
+            restored = stored.astype(np.float32) * scales
+            self._blocks.append((stored, scales.astype(np.float32)))
+        elif self.quantization == "float16":
+            stored = vectors.astype(np.float16)
+            restored = stored.astype(np.float32)
+            self._blocks.append((stored, None))
+        else:
+            restored = vectors
+            self._blocks.append((vectors, None))
+
+        self._norms.append((restored * restored).sum(axis=1))
+        self._matrix = None
+        return [uuid.uuid4().hex for _ in texts]
+
+    def _consolidate(self):
+        if self._matrix is None:
+            stored = np.concatenate([b[0] for b in self._blocks]) if self._blocks else np.zeros((0, 0), np.float32)
+            scales = np.concatenate([b[1] for b in self._blocks]) if self.quantization == "int8" and self._blocks else None
+            norms = np.concatenate(self._norms) if self._norms else np.zeros(0, np.float32)
+            self._matrix = (stored, scales, norms)
+        return self._matrix
+
+    # -------- searching --------
+
+    def _distances(self, query: np.ndarray) -> np.ndarray:
+        stored, scales, norms = self._consolidate()
+        dots = np.empty(len(stored), dtype=np.float32)
+        for i in range(0, len(stored), BLOCK_ROWS):
+            block = stored[i:i + BLOCK_ROWS].astype(np.float32)
+            dots[i:i + BLOCK_ROWS] = block @ query
+        if scales is not None:
+            dots *= scales[:, 0]
+        return norms - 2 * dots + float(query @ query)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4):
+        if not self.texts:
+            return []
+        dist = self._distances(np.asarray(embedding, dtype=np.float32))
+        k = min(k, len(dist))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top])]
+        return [(Document(page_content=self.texts[i], metadata=self.metadatas[i]), float(dist[i])) for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4):
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4):
+        return [d for d, _ in self.similarity_search_with_score(query, k)]